@@ -1,13 +1,18 @@
 import streamlit as st
-from streamlit_gsheets import GSheetsConnection
+import gspread
+from gspread.utils import rowcol_to_a1
 import pandas as pd
-from datetime import date, datetime, timedelta
+import numpy as np
+from datetime import date, timedelta
 import time
 import plotly.express as px
-from datetime import date, timedelta
 
 st.set_page_config(layout="wide", page_title="Nibworks ✒️")
 
+# Built once at import instead of on every rerun
+CURRENCIES = ("₺", "$", "€", "£")
+CURRENCY_IDX = {c: i for i, c in enumerate(CURRENCIES)}
+
 # --- CUSTOM CSS INJECTION ---
 st.markdown("""
     <style>
@@ -42,129 +47,279 @@ def check_password():
         return False
     return True
 
-# --- DATABASE ENGINE ---
-class DbManager:
-    def __init__(self):
-        self.conn = st.connection("gsheets", type=GSheetsConnection)
-
-    def _get_sheet_from_memory(self, sheet_name, required_cols):
-        state_key = f"db_{sheet_name}"
-        if state_key not in st.session_state:
-            df = self.conn.read(worksheet=sheet_name, ttl=600)
-            st.session_state[state_key] = df
-            
-        df = st.session_state[state_key]
-        for col in required_cols:
-            if col not in df.columns: df[col] = ""
-        return df
-
-    def _save_sheet_to_memory_and_google(self, sheet_name, df):
-        st.session_state[f"db_{sheet_name}"] = df
-        self.conn.update(worksheet=sheet_name, data=df)
-
-    def load_inventory(self):
-        df = self._get_sheet_from_memory("Inventory", ["Date", "Type", "Brand", "Model", "Color", "Details", "Purchase Price", "Target Price", "Stock", "Supplier", "Currency"])
-        df["Stock"] = pd.to_numeric(df["Stock"], errors='coerce').fillna(0)
+# --- CACHED SHEET READS ---
+# Required columns per worksheet. Missing headers are added as blanks so the app never crashes on a fresh sheet.
+SHEET_COLUMNS = {
+    "Inventory": ["Date", "Type", "Brand", "Model", "Color", "Details", "Purchase Price", "Target Price", "Stock", "Supplier", "Currency"],
+    "Nib Orders": ["Date", "Name", "Quantity", "Status", "Price", "Currency"],
+    "Sales": ["Selling Price", "Cost Price", "Currency", "Date", "Item Sold"],
+    "Expenses": ["Amount", "Category", "Currency", "Date"],
+}
+
+# Low-cardinality text columns, stored as integer-coded categoricals so masks and group-bys run on codes
+CATEGORY_COLUMNS = {
+    "Inventory": ["Type", "Brand", "Color", "Supplier", "Currency"],
+    "Nib Orders": ["Status", "Currency"],
+    "Sales": ["Currency"],
+    "Expenses": ["Category", "Currency"],
+}
+
+# Free-text columns, kept as Arrow-backed strings so .str methods run over contiguous buffers instead of Python objects
+TEXT_COLUMNS = {
+    "Inventory": ["Model", "Details"],
+    "Nib Orders": ["Name"],
+    "Sales": ["Item Sold"],
+    "Expenses": [],
+}
+
+# Money columns that may hold text like "₺12,5": everything but digits and separators is stripped and
+# "," is read as the decimal point. There is no thousands separator, so "1.250" is 1.25, not 1250.
+# Coerced once per fetch instead of on every Analytics rerun.
+MONEY_COLUMNS = {
+    "Nib Orders": ["Price"],
+    "Sales": ["Selling Price", "Cost Price"],
+    "Expenses": ["Amount"],
+}
+
+# Sheets whose "Date" column feeds the Analytics time filters
+DATED_SHEETS = ("Nib Orders", "Sales", "Expenses")
+
+# Day zero of Sheets' date serial numbers
+SHEETS_EPOCH = date(1899, 12, 30)
+
+@st.cache_resource(show_spinner=False)
+def _gspread_client():
+    # Service-account credentials and their HTTPS session live for the whole server, so token
+    # refreshes and TLS handshakes are not repeated per rerun. Reads the [connections.gsheets] secrets block.
+    return gspread.service_account_from_dict(dict(st.secrets["connections"]["gsheets"]))
+
+@st.cache_resource(show_spinner=False)
+def _open_spreadsheet():
+    # Opening the spreadsheet costs a metadata round-trip, so one gspread handle is shared by every session
+    spreadsheet = st.secrets["connections"]["gsheets"]["spreadsheet"]
+    client = _gspread_client()
+    return client.open_by_url(spreadsheet) if spreadsheet.startswith("http") else client.open_by_key(spreadsheet)
+
+@st.cache_data(show_spinner=False)
+def _sheet_ids():
+    # batchUpdate requests address worksheets by numeric sheetId, so the title -> id map is read once, not per write
+    return {ws.title: ws.id for ws in _open_spreadsheet().worksheets()}
+
+def _sheet_id(sheet_name):
+    ids = _sheet_ids()
+    if sheet_name not in ids:
+        # The tab was added after the map was cached
+        _sheet_ids.clear()
+        ids = _sheet_ids()
+    return ids[sheet_name]
+
+def _row_data(values):
+    # Cells for batchUpdate requests: numbers stay numbers and text is stored literally, never parsed.
+    # Dates become real date cells shown as yyyy-mm-dd, so they sort and work in formulas like the dates
+    # the old conn.update (USER_ENTERED) wrote, and read back as ISO text for _prepare_sheet's strict parse.
+    cells = []
+    for value in values:
+        if value is None or value == "":
+            cells.append({})
+        elif isinstance(value, date):
+            cells.append({
+                "userEnteredValue": {"numberValue": (value - SHEETS_EPOCH).days},
+                "userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "yyyy-mm-dd"}},
+            })
+        elif isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+            cells.append({"userEnteredValue": {"numberValue": float(value)}})
+        else:
+            cells.append({"userEnteredValue": {"stringValue": str(value)}})
+    return {"values": cells}
+
+def _values_to_frame(values):
+    # Row 1 is the header. The API trims trailing blanks, so short rows are padded back out to full width.
+    header, rows = (values[0], values[1:]) if values else ([], [])
+    width = len(header)
+    return pd.DataFrame([(row + [""] * width)[:width] for row in rows], columns=header)
+
+def _prepare_sheet(sheet_name, df):
+    present = set(df.columns)
+    missing = [col for col in SHEET_COLUMNS[sheet_name] if col not in present]
+    if missing: df[missing] = ""
+
+    if sheet_name == "Inventory":
+        df["Stock"] = pd.to_numeric(df["Stock"], errors='coerce').fillna(0).astype("int32")
         df["Purchase Price"] = pd.to_numeric(df["Purchase Price"], errors='coerce').fillna(0.0)
         df["Target Price"] = pd.to_numeric(df["Target Price"], errors='coerce').fillna(0.0)
-        if "Currency" not in df.columns: df["Currency"] = "$" 
-        return df
-
-    def load_nib_orders(self):
-        df = self._get_sheet_from_memory("Nib Orders", ["Date", "Name", "Quantity", "Status", "Price", "Currency"])
-        df["Quantity"] = pd.to_numeric(df["Quantity"], errors='coerce').fillna(1)
-        df["Price"] = pd.to_numeric(df["Price"], errors='coerce').fillna(0.0)
         if "Currency" not in df.columns: df["Currency"] = "$"
-        return df
+        # THE FIX: .fillna("") prevents blank fields from destroying the search string
+        df["_search_blob"] = (
+            df["Brand"].fillna("").astype(str) + " " +
+            df["Model"].fillna("").astype(str) + " " +
+            df["Type"].fillna("").astype(str) + " " +
+            df["Color"].fillna("").astype(str)
+        ).str.lower().astype(object)  # Plain Python strings for search_inventory; pandas 3 would otherwise hand back Arrow-backed str
+        # Matches the "Brand Model" text register_sale writes into Sales["Item Sold"], for the item-type lookup
+        df["_item_key"] = (df["Brand"].fillna("").astype(str) + " " + df["Model"].fillna("").astype(str)).str.strip().str.lower().astype(object)
+    elif sheet_name == "Nib Orders":
+        df["Quantity"] = pd.to_numeric(df["Quantity"], errors='coerce').fillna(1).astype("int32")
+        if "Currency" not in df.columns: df["Currency"] = "$"
+        # THIS SAVES YOUR 3750 ROW: Strips hidden spaces and forces correct capitalization
+        df["Status"] = df["Status"].fillna("").astype(str).str.strip().str.title()
+
+    for col in MONEY_COLUMNS.get(sheet_name, []):
+        df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[^\d\.,]', '', regex=True).str.replace(',', '.', regex=False), errors='coerce').fillna(0.0)
+
+    # Parsed once per fetch for the work queue and Analytics period filters; the raw "Date" text stays as the sheet has it.
+    # The app writes ISO yyyy-mm-dd, so that is tried strictly first: a day-first parse would swap day and month
+    # whenever the day is 12 or less. Only what's left (hand-entered, locale-formatted dates) goes through dayfirst/mixed.
+    if sheet_name in DATED_SHEETS:
+        dates = df["Date"].astype(str)
+        parsed = pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce')
+        unparsed = parsed.isna()
+        if unparsed.any():
+            parsed[unparsed] = pd.to_datetime(dates[unparsed], errors='coerce', dayfirst=True, format='mixed')
+        df["DateObj"] = parsed
+
+    # Blanks become "" before the conversion, so callers never need .fillna("") on these columns
+    for col in CATEGORY_COLUMNS[sheet_name]:
+        df[col] = df[col].fillna("").astype(str).astype("category")
+    for col in TEXT_COLUMNS[sheet_name]:
+        df[col] = df[col].fillna("").astype(str).astype("string[pyarrow]")
+    return df
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_sheets(sheet_names):
+    # One values.batchGet for every requested worksheet, shared across reruns.
+    # Every DbManager write clears this cache straight away; the ttl only bounds how long
+    # edits made directly in the spreadsheet take to show up without pressing "Refresh Data".
+    # Streamlit hands back a fresh copy on every call, so callers are free to mutate the result.
+    # Numbers come back raw (no thousands separators to trip up pd.to_numeric), dates as the sheet shows them.
+    response = _open_spreadsheet().values_batch_get(
+        [f"'{name}'" for name in sheet_names],
+        params={"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "FORMATTED_STRING"},
+    )
+    return {
+        name: _prepare_sheet(name, _values_to_frame(value_range.get("values", [])))
+        for name, value_range in zip(sheet_names, response["valueRanges"])
+    }
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _sheet_header(sheet_name):
+    # Writers only need row 1 to line a new row up, so they don't unpickle whole cached frames for it.
+    # This is the sheet's real header, before _prepare_sheet fills in any required columns.
+    return _open_spreadsheet().values_get(f"'{sheet_name}'!1:1").get("values", [[]])[0]
+
+# --- DATABASE ENGINE ---
+class DbManager:
+    def _append_row(self, sheet_name, row, *requests):
+        # Only the new row goes over the wire, as an appendCells request: Sheets places it after the last
+        # filled row server-side, so nothing is re-read first and a stale cache can't overwrite anyone's entry.
+        # Extra requests (register_sale's stock update) ride along in the same batchUpdate.
+        header = _sheet_header(sheet_name)
+        new_cols = [col for col in row if col not in header]
+        if header:
+            if new_cols:
+                # Fields the sheet has no column for yet get new header cells on the right instead of being dropped
+                requests += ({"updateCells": {
+                    "start": {"sheetId": _sheet_id(sheet_name), "rowIndex": 0, "columnIndex": len(header)},
+                    "rows": [_row_data(new_cols)],
+                    "fields": "userEnteredValue",
+                }},)
+                header = header + new_cols
+            rows = [_row_data(row.get(col, "") for col in header)]
+        else:
+            # Brand new sheet: write the headers together with the first row
+            rows = [_row_data(row), _row_data(row.values())]
+        _open_spreadsheet().batch_update({"requests": [
+            *requests,
+            {"appendCells": {"sheetId": _sheet_id(sheet_name), "rows": rows, "fields": "userEnteredValue,userEnteredFormat.numberFormat"}},
+        ]})
+        if new_cols:
+            # Header cells were written, so the cached header row is out of date
+            _sheet_header.clear()
+        _fetch_sheets.clear()
+
+    def load(self, *sheet_names):
+        # The requested worksheets in a single batchGet: one round-trip per cache miss, not one per sheet
+        return _fetch_sheets(sheet_names)
         
     def add_inventory_item(self, df, item_data):
-        # 1. FORCE LIVE READ: 0-second cache ensures we never overwrite someone else's entry
-        st.cache_data.clear()
-        live_df = self.conn.read(worksheet="Inventory", ttl=0)
-        
-        # 2. Append to the LIVE data
-        updated_df = pd.concat([live_df, pd.DataFrame([item_data])], ignore_index=True)
-        
-        # --- FIXED COMMAND ---
-        self.conn.update(worksheet="Inventory", data=updated_df)
-        
-        return updated_df
+        self._append_row("Inventory", item_data)
+        return True
         
     def add_nib_order(self, df, order_data):
-        # 1. Force Live Read
-        st.cache_data.clear()
-        live_nibs = self.conn.read(worksheet="Nib Orders", ttl=0)
-        
-        # 2. Append and Save Live
-        updated_nibs = pd.concat([live_nibs, pd.DataFrame([order_data])], ignore_index=True)
-        self.conn.update(worksheet="Nib Orders", data=updated_nibs)
-        return updated_nibs 
+        self._append_row("Nib Orders", order_data)
+        return True
 
     def update_nib_order(self, df, index, new_status, new_price):
-        # 1. Force Live Read
-        st.cache_data.clear()
-        live_nibs = self.conn.read(worksheet="Nib Orders", ttl=0)
-        
-        # 2. Update and Save Live
-        live_nibs.loc[index, "Status"] = new_status
-        live_nibs.loc[index, "Price"] = float(new_price)
-        self.conn.update(worksheet="Nib Orders", data=live_nibs)
+        # Write just the two cells that change instead of reading and re-uploading the whole sheet
+        sheet_row = index + 2
+        _open_spreadsheet().values_batch_update({
+            "valueInputOption": "RAW",
+            "data": [
+                {"range": f"'Nib Orders'!{rowcol_to_a1(sheet_row, df.columns.get_loc('Status') + 1)}", "values": [[new_status]]},
+                {"range": f"'Nib Orders'!{rowcol_to_a1(sheet_row, df.columns.get_loc('Price') + 1)}", "values": [[float(new_price)]]},
+            ],
+        })
+        _fetch_sheets.clear()
 
     def register_sale(self, inventory_df, row_index, final_selling_price, sales_currency, exchange_rate):
-        brand = inventory_df.loc[row_index, 'Brand']
-        model = inventory_df.loc[row_index, 'Model']
-        original_cost = float(inventory_df.loc[row_index, 'Purchase Price']) 
-        
-        normalized_cost = original_cost * exchange_rate
-        item_name = f"{brand} {model}"
+        # 0. CHEAP CHECK: the cached stock is already zero, so don't spend any requests on it
+        if inventory_df.at[row_index, "Stock"] < 1:
+            return False, "❌ Out of Stock!"
         
-        # 1. READ LIVE INVENTORY FIRST
-        st.cache_data.clear()
-        live_inv = self.conn.read(worksheet="Inventory", ttl=0)
+        normalized_cost = inventory_df.at[row_index, "Purchase Price"] * exchange_rate
+        item_name = f"{inventory_df.at[row_index, 'Brand']} {inventory_df.at[row_index, 'Model']}"
         
-        # 2. DO THE MATH
-        actual_live_stock = live_inv.loc[row_index, "Stock"]
+        # 1. READ THE LIVE STOCK CELL FIRST (row 1 is the header, so data row N lives on sheet row N+2)
+        stock_cell = f"'Inventory'!{rowcol_to_a1(row_index + 2, inventory_df.columns.get_loc('Stock') + 1)}"
+        live_stock = _open_spreadsheet().values_get(stock_cell, params={"valueRenderOption": "UNFORMATTED_VALUE"})
+        try:
+            actual_live_stock = int(float(live_stock["values"][0][0]))
+        except (KeyError, IndexError, TypeError, ValueError):
+            actual_live_stock = 0
         
         if actual_live_stock < 1: 
+            # The cached inventory was stale; drop it so the next rerun shows the real stock
+            _fetch_sheets.clear()
             return False, "❌ Out of Stock!"
 
-        # 3. DEDUCT AND SAVE (This is the fixed command)
-        live_inv.loc[row_index, "Stock"] = actual_live_stock - 1
-        self.conn.update(worksheet="Inventory", data=live_inv)
-
-        # 4. LOG THE SALE (This is the fixed command)
-        live_sales = self.conn.read(worksheet="Sales", ttl=0)
+        # 2. DEDUCT THE STOCK AND LOG THE SALE IN ONE REQUEST
         new_sale = {
-            "Date": str(date.today()), "Item Sold": item_name, "Quantity": 1,
+            "Date": date.today(), "Item Sold": item_name, "Quantity": 1,
             "Selling Price": float(final_selling_price), "Currency": sales_currency,
             "Cost Price": normalized_cost, "Exchange Rate": exchange_rate
         }
-        updated_sales = pd.concat([live_sales, pd.DataFrame([new_sale])], ignore_index=True)
-        self.conn.update(worksheet="Sales", data=updated_sales)
-        
-        # 5. NUKE CACHE
-        st.cache_data.clear()
+        self._append_row("Sales", new_sale, {"updateCells": {
+            "start": {"sheetId": _sheet_id("Inventory"), "rowIndex": row_index + 1, "columnIndex": inventory_df.columns.get_loc("Stock")},
+            "rows": [_row_data([actual_live_stock - 1])],
+            "fields": "userEnteredValue",
+        }})
         return True, f"✅ Sold {item_name} for {final_selling_price} {sales_currency}!"
         
     def log_expense(self, category, amount, currency, notes):
-        # 1. FORCE LIVE READ: 0-second cache prevents overwriting data
-        st.cache_data.clear()
-        live_exp = self.conn.read(worksheet="Expenses", ttl=0)
-        
-        # 2. Append the new expense
         new_expense = {
-            "Date": str(date.today()), 
+            "Date": date.today(), 
             "Category": category, 
             "Amount": float(amount), 
             "Currency": currency, 
             "Notes": notes
         }
-        updated_exp = pd.concat([live_exp, pd.DataFrame([new_expense])], ignore_index=True)
-        
-        # 3. WRITE DIRECTLY TO GOOGLE SHEETS (Using the correct Streamlit command)
-        self.conn.update(worksheet="Expenses", data=updated_exp)
+        self._append_row("Expenses", new_expense)
         return True
 
+@st.cache_resource(show_spinner=False)
+def get_db():
+    # DbManager holds no per-session state (reads and writes go through the cached gspread handle), so one instance serves every rerun
+    return DbManager()
+
+# --- TOKENIZED MULTI-WORD SEARCH ENGINE ---
+def search_inventory(df, term):
+    # Every word must appear somewhere in the lowercased Brand/Model/Type/Color corpus built in _prepare_sheet.
+    # Each word only scans the rows that survived the previous one, and plain `in` on the raw
+    # strings skips the Series machinery behind .str.contains.
+    for word in term.lower().split():
+        blob = df["_search_blob"].to_numpy()
+        df = df[np.fromiter((word in text for text in blob), dtype=bool, count=len(blob))]
+    return df
+
 # --- MAIN APP ---
 def main():
     if check_password():
@@ -192,15 +347,21 @@ def main():
                     st.cache_data.clear() 
                     st.rerun()
 
-        db = DbManager()
+        db = get_db()
         
         try:
-            inventory = db.load_inventory()
-            nib_orders = db.load_nib_orders()
+            sheets = db.load("Inventory", "Nib Orders")
+            inventory = sheets["Inventory"]
+            nib_orders = sheets["Nib Orders"]
         except Exception as e:
             st.error(f"⚠️ Database Error: {e}. Check your Sheet Headers!")
             st.stop()
 
+        # One status comparison per rerun, shared by the Nib Services and Analytics tabs
+        nib_status = nib_orders["Status"].to_numpy()
+        active_orders = nib_orders[nib_status == "In Progress"]
+        completed_nibs = nib_orders[nib_status == "Completed"]
+
         tab_sell, tab_nib, tab_inv, tab_finance = st.tabs(["💰 Negotiate & Sell", "✒️ Nib Services", "📦 Inventory", "📊 Analytics"])
 
         # --- TAB 1: OPERATIONS (Omitted for brevity, remains unchanged from previous implementation) ---
@@ -209,42 +370,27 @@ def main():
             
             with c1:
                 st.subheader("🛒 Transaction")
-                search = st.text_input("Find Item", placeholder="Search Brand, Model, Type, Color... (e.g. 'montblanc blue ink')")
-
-                # --- Tokenized Multi-Word Search Engine ---
-                if search:
-                    # THE FIX: .fillna("") prevents blank fields from destroying the search string
-                    search_corpus = (
-                        inventory["Brand"].fillna("").astype(str) + " " +
-                        inventory["Model"].fillna("").astype(str) + " " +
-                        inventory["Type"].fillna("").astype(str) + " " +
-                        inventory["Color"].fillna("").astype(str)
-                    ).str.lower()
-                    
-                    search_words = search.lower().split()
-                    
-                    mask = pd.Series([True] * len(inventory))
-                    for word in search_words:
-                        mask = mask & search_corpus.str.contains(word, na=False)
-                        
-                    results = inventory[mask]
-                else:
-                    results = inventory
+                # Inside a form the search only reruns the script on Enter / Search, not on every keystroke
+                with st.form("search_form", clear_on_submit=False):
+                    search = st.text_input("Find Item", placeholder="Search Brand, Model, Type, Color... (e.g. 'montblanc blue ink')")
+                    st.form_submit_button("🔍 Search")
+
+                results = search_inventory(inventory, search)
 
                 if not results.empty:
                     options = results.index.tolist()
                     
                     # --- Dynamic Label Formatter ---
-                    def labeler(i):
-                        row = results.loc[i]
-                        raw_color = str(row['Color']).strip()
-                        if raw_color.lower() != 'nan' and raw_color != '':
-                            color_display = f" ({raw_color})"
-                        else:
-                            color_display = ""
-                        return f"{row['Type']} | {row['Brand']} {row['Model']}{color_display}"
+                    # Every label is built in one vectorized pass instead of a results.loc[i] per option
+                    raw_color = results["Color"].astype(str).str.strip()
+                    color_display = (" (" + raw_color + ")").where((raw_color != "") & (raw_color.str.lower() != "nan"), "")
+                    labels = dict(zip(options, (
+                        results["Type"].astype(str) + " | " +
+                        results["Brand"].astype(str) + " " +
+                        results["Model"].astype(str) + color_display
+                    )))
                     
-                    selected_idx = st.selectbox("Select Item", options, format_func=labeler)
+                    selected_idx = st.selectbox("Select Item", options, format_func=labels.get)
                     
                     # --- NEGOTIATION ENGINE ---
                     row = results.loc[selected_idx]
@@ -257,7 +403,7 @@ def main():
                     # 1. Price & Currency Input (Now increments by 100)
                     col_p, col_c = st.columns([2, 1])
                     final_price = col_p.number_input("Final Agreed Price", value=target, step=100.0)
-                    sales_curr = col_c.selectbox("Sales Currency", ["₺", "$", "€", "£"], index=["₺", "$", "€", "£"].index(item_currency) if item_currency in ["₺", "$", "€", "£"] else 0)
+                    sales_curr = col_c.selectbox("Sales Currency", CURRENCIES, index=CURRENCY_IDX.get(item_currency, 0))
                     
                     # 2. Exchange Rate Logic
                     exchange_rate = 1.0
@@ -281,7 +427,6 @@ def main():
                             for key in list(st.session_state.keys()):
                                 if "password" not in key.lower() and key != "last_refresh":
                                     del st.session_state[key]
-                            st.cache_data.clear()
                             time.sleep(1.5) 
                             st.rerun()
                         else:
@@ -292,7 +437,7 @@ def main():
                     cat = st.selectbox("Category", ["Shipment", "Bank/Card", "Food & Beverages", "Salary", "Taxi", "Debt", "Inventory Purchase", "Other"])
                     e_col1, e_col2 = st.columns([2, 1])
                     amt = e_col1.number_input("Amount", min_value=0.0, step=50.0)
-                    curr = e_col2.selectbox("Currency", ["₺", "$", "€", "£"])
+                    curr = e_col2.selectbox("Currency", CURRENCIES)
                     note = st.text_input("Note")
                     
                     if st.form_submit_button("Save Expense"):
@@ -303,7 +448,6 @@ def main():
                         for key in list(st.session_state.keys()):
                             if "password" not in key.lower() and key != "last_refresh":
                                 del st.session_state[key]
-                        st.cache_data.clear()
                         time.sleep(1.5)
                         st.rerun()
                         
@@ -323,12 +467,12 @@ def main():
                     n_name = st.text_input("Customer/Order Name")
                     n_qty = st.number_input("Quantity", min_value=1, step=1)
                     n_price = st.number_input("Quoted Price", value=0.0, step=50.0)
-                    n_curr = st.selectbox("Currency", ["₺", "$", "€", "£"])
+                    n_curr = st.selectbox("Currency", CURRENCIES)
                     
                     if st.form_submit_button("Create Order"):
                         if n_name:
-                            nib_orders = db.add_nib_order(nib_orders, {
-                                "Date": str(n_date), "Name": n_name, "Quantity": n_qty,
+                            db.add_nib_order(nib_orders, {
+                                "Date": n_date, "Name": n_name, "Quantity": n_qty,
                                 "Status": "In Progress", "Price": n_price, "Currency": n_curr
                             })
                             st.toast("Order successfully created!", icon="✅")
@@ -338,7 +482,6 @@ def main():
                             for key in list(st.session_state.keys()):
                                 if "password" not in key.lower() and key != "last_refresh":
                                     del st.session_state[key]
-                            st.cache_data.clear()
                             time.sleep(1.5)
                             st.rerun()
                         else:
@@ -347,47 +490,44 @@ def main():
 
             with col_queue:
                 st.subheader("📋 Active Work Queue")
-                active_mask = nib_orders["Status"] == "In Progress"
-                active_orders = nib_orders[active_mask]
-                
                 if active_orders.empty:
                     st.success("All caught up! No active orders.")
                 else:
-                    for idx, row in active_orders.iterrows():
-                        order_date = datetime.strptime(str(row["Date"]), "%Y-%m-%d").date()
-                        days_waiting = (date.today() - order_date).days
-                        
+                    # Waiting days for every order in one vectorized pass, off the loader's DateObj (strict ISO first, day-first only as a fallback)
+                    active_orders = active_orders.assign(Waiting=(pd.Timestamp(date.today()) - active_orders["DateObj"]).dt.days.fillna(0).astype("int32"))
+                    
+                    # itertuples hands back lightweight namedtuples instead of building a Series per row
+                    for order in active_orders.itertuples(name="Order"):
+                        idx = order.Index
                         with st.container():
-                            st.markdown(f"**{row['Name']}** | 📦 Qty: {row['Quantity']}")
-                            st.markdown(f"🔴 *In Progress* — Waiting: **{days_waiting} days**")
+                            st.markdown(f"**{order.Name}** | 📦 Qty: {order.Quantity}")
+                            st.markdown(f"🔴 *In Progress* — Waiting: **{order.Waiting} days**")
                             
                             # The Fix: Use vertical_alignment="bottom" and specific column widths
                             # This automatically aligns the bottom of the input box, text, and button.
                             c_price, c_sym, c_btn = st.columns([2, 0.5, 2], vertical_alignment="bottom")
                             
                             with c_price:
-                                new_p = st.number_input("Final Price", value=float(row["Price"]), step=50.0, key=f"p_{idx}")
+                                new_p = st.number_input("Final Price", value=float(order.Price), step=50.0, key=f"p_{idx}")
                             
                             with c_sym:
                                 # Removed the awful st.write("##") spacers
-                                st.markdown(f"**{row['Currency']}**")
+                                st.markdown(f"**{order.Currency}**")
 
                             with c_btn:
                                 if st.button("✅ Mark Completed", key=f"btn_{idx}", use_container_width=True):
                                     db.update_nib_order(nib_orders, idx, "Completed", new_p)
-                                    st.toast(f"Completed {row['Name']}!", icon="🎉")
+                                    st.toast(f"Completed {order.Name}!", icon="🎉")
                                     
                                     # --- AUTO-REFRESH WIPE ---
                                     for key in list(st.session_state.keys()):
                                         if "password" not in key.lower() and key != "last_refresh":
                                             del st.session_state[key]
-                                    st.cache_data.clear()
                                     time.sleep(1.0)
                                     st.rerun()
 
             st.subheader("✅ Completed Orders")
-            completed_orders = nib_orders[nib_orders["Status"] == "Completed"]
-            st.dataframe(completed_orders, use_container_width=True)
+            st.dataframe(completed_nibs.drop(columns="DateObj"), use_container_width=True)
 
         # --- TAB 3: INVENTORY (Omitted for brevity, remains unchanged) ---
         with tab_inv:
@@ -409,11 +549,11 @@ def main():
                     cost_p = c_cost.number_input("Purchase Price (Cost)", value=0.0)
                     targ_p = c_target.number_input("Target Sale Price", value=0.0)
                     stk = c_stock.number_input("Stock", value=1, step=1)
-                    cur = c_cur.selectbox("Currency", ["₺", "$", "€", "£"])
+                    cur = c_cur.selectbox("Currency", CURRENCIES)
 
                     if st.form_submit_button("Save Item"):
                         new_item = {
-                            "Date":str(d), "Type": item_type, "Brand":b, "Model":m, "Color":color, "Details":det,
+                            "Date":d, "Type": item_type, "Brand":b, "Model":m, "Color":color, "Details":det,
                             "Purchase Price":cost_p, "Target Price":targ_p, 
                             "Stock":stk, "Supplier":sup, "Currency":cur
                         }
@@ -424,14 +564,13 @@ def main():
                         for key in list(st.session_state.keys()):
                             if "password" not in key.lower() and key != "last_refresh":
                                 del st.session_state[key]
-                        st.cache_data.clear()
                         time.sleep(1.5)
                         st.rerun()
             st.subheader("Current Stock")
 
             # --- SMART SORT & COLOR HIGHLIGHTING ---
             # 1. Sort the inventory: Highest stock at the top, out-of-stock at the bottom
-            display_inv = inventory.sort_values(by="Stock", ascending=False).reset_index(drop=True)
+            display_inv = inventory.drop(columns=["_search_blob", "_item_key"]).sort_values(by="Stock", ascending=False).reset_index(drop=True)
             
             # 2. Create the color logic
             def highlight_out_of_stock(row):
@@ -458,31 +597,10 @@ def main():
             # 1. Made the main title smaller (subheader instead of header)
             st.subheader("📊 Financial Analytics") 
             try:
-                # Load Data
-                sales_df = db._get_sheet_from_memory("Sales", ["Selling Price", "Cost Price", "Currency", "Date", "Item Sold"])
-                expense_df = db._get_sheet_from_memory("Expenses", ["Amount", "Category", "Currency", "Date"])
-                inv_df = db._get_sheet_from_memory("Inventory", ["Type", "Brand", "Model"]) # Added to look up item types!
-                
-                # 2. AGGRESSIVE DATA CLEANING
-                sales_df["DateObj"] = pd.to_datetime(sales_df["Date"], errors='coerce', dayfirst=True, format='mixed')
-                expense_df["DateObj"] = pd.to_datetime(expense_df["Date"], errors='coerce', dayfirst=True, format='mixed')
-                
-                sales_df["Selling Price"] = pd.to_numeric(sales_df["Selling Price"].astype(str).str.replace(r'[^\d\.,]', '', regex=True).str.replace(',', '.'), errors='coerce').fillna(0)
-                sales_df["Cost Price"] = pd.to_numeric(sales_df["Cost Price"].astype(str).str.replace(r'[^\d\.,]', '', regex=True).str.replace(',', '.'), errors='coerce').fillna(0)
-                expense_df["Amount"] = pd.to_numeric(expense_df["Amount"].astype(str).str.replace(r'[^\d\.,]', '', regex=True).str.replace(',', '.'), errors='coerce').fillna(0)
+                # Load Data (inside this try, so a missing Sales or Expenses tab only affects Analytics)
+                finance = db.load("Sales", "Expenses")
+                sales_df, expense_df = finance["Sales"], finance["Expenses"]
 
-                # Prep Nib Orders for bulletproof math
-                if not nib_orders.empty:
-                    nib_orders["DateObj"] = pd.to_datetime(nib_orders["Date"], errors='coerce', dayfirst=True, format='mixed')
-                    nib_orders["Price"] = pd.to_numeric(nib_orders["Price"].astype(str).str.replace(r'[^\d\.,]', '', regex=True).str.replace(',', '.'), errors='coerce').fillna(0)
-                    
-                    # THIS SAVES YOUR 3750 ROW: Strips hidden spaces and forces correct capitalization
-                    nib_orders["Status"] = nib_orders["Status"].astype(str).str.strip().str.title()
-                else:
-                    nib_orders["DateObj"] = pd.Series(dtype='datetime64[ns]')
-                    nib_orders["Price"] = pd.Series(dtype='float64')
-                    nib_orders["Status"] = pd.Series(dtype='object')
-                    
                 # Setup Time Filters
                 now = pd.Timestamp.now()
                 seven_days_ago = now - pd.Timedelta(days=7)
@@ -493,35 +611,43 @@ def main():
                 month_exp = expense_df[expense_df["DateObj"].dt.month == now.month]
                 week_exp = expense_df[expense_df["DateObj"] >= seven_days_ago]
 
-                completed_nibs = nib_orders[nib_orders["Status"] == "Completed"] if not nib_orders.empty else pd.DataFrame(columns=["DateObj", "Price"])
                 month_nibs = completed_nibs[completed_nibs["DateObj"].dt.month == now.month]
                 week_nibs = completed_nibs[completed_nibs["DateObj"] >= seven_days_ago]
 
                 # --- SECTION 1: NET PROFIT ---
                 st.write("#### 💰 Net Profit")
                 
-                def calc_profit(s_df, e_df, n_df):
+                # Sum each period once; the profit, revenue and expense tiles all read from this table
+                periods = {
+                    "all": (sales_df, expense_df, completed_nibs),
+                    "month": (month_sales, month_exp, month_nibs),
+                    "week": (week_sales, week_exp, week_nibs),
+                }
+                totals = {}
+                for period, (s_df, e_df, n_df) in periods.items():
                     rev = s_df["Selling Price"].sum() + n_df["Price"].sum()
-                    costs = s_df["Cost Price"].sum() + e_df["Amount"].sum()
-                    return rev - costs
+                    exp = e_df["Amount"].sum()
+                    totals[period] = {"rev": rev, "exp": exp, "profit": rev - s_df["Cost Price"].sum() - exp}
 
                 p1, p2, p3 = st.columns(3)
-                p1.metric("All-Time Profit", f"{calc_profit(sales_df, expense_df, completed_nibs):,.2f}")
-                p2.metric("This Month Profit", f"{calc_profit(month_sales, month_exp, month_nibs):,.2f}")
-                p3.metric("Last 7 Days Profit", f"{calc_profit(week_sales, week_exp, week_nibs):,.2f}")
+                p1.metric("All-Time Profit", f"{totals['all']['profit']:,.2f}")
+                p2.metric("This Month Profit", f"{totals['month']['profit']:,.2f}")
+                p3.metric("Last 7 Days Profit", f"{totals['week']['profit']:,.2f}")
 
                 st.divider()
 
                 # --- SECTION 2: NIB SERVICE VOLUME ---
                 st.write("#### ✒️ Nib Service Volume")
                 if not nib_orders.empty:
-                    orders_7d = nib_orders[nib_orders["DateObj"] >= seven_days_ago]
-                    orders_30d = nib_orders[nib_orders["DateObj"] >= (now - pd.Timedelta(days=30))]
+                    # Only the counts are shown, so count straight off the numpy arrays instead of slicing frames
+                    order_dates = nib_orders["DateObj"].to_numpy()
+                    orders_7d = int((order_dates >= seven_days_ago.to_datetime64()).sum())
+                    orders_30d = int((order_dates >= (now - pd.Timedelta(days=30)).to_datetime64()).sum())
                     
                     v1, v2, v3 = st.columns(3)
-                    v1.metric("Orders (Last 7 Days)", len(orders_7d))
-                    v2.metric("Orders (Last 30 Days)", len(orders_30d))
-                    v3.metric("Pending Queue", len(nib_orders[nib_orders["Status"] == "In Progress"]))
+                    v1.metric("Orders (Last 7 Days)", orders_7d)
+                    v2.metric("Orders (Last 30 Days)", orders_30d)
+                    v3.metric("Pending Queue", len(active_orders))
                 else:
                     st.info("No Nib Orders yet.")
 
@@ -535,7 +661,7 @@ def main():
                 with chart_col1:
                     st.write("**Expenses by Category**")
                     if not month_exp.empty:
-                        exp_pie_data = month_exp.groupby("Category")["Amount"].sum().reset_index()
+                        exp_pie_data = month_exp.groupby("Category", observed=True)["Amount"].sum().reset_index()
                         fig_exp = px.pie(
                             exp_pie_data, values='Amount', names='Category', hole=0.4, 
                             color_discrete_sequence=px.colors.sequential.RdBu
@@ -550,12 +676,12 @@ def main():
                     
                     if not month_sales.empty or not month_nibs.empty:
                         # 1. AGGRESSIVE CLEANING: Lowercase and strip spaces for a flawless match
-                        inv_df["Item Key"] = (inv_df["Brand"].fillna("").astype(str) + " " + inv_df["Model"].fillna("").astype(str)).str.strip().str.lower()
-                        type_mapping = dict(zip(inv_df["Item Key"], inv_df["Type"].fillna("").astype(str).str.lower()))
+                        # Reuses the inventory main() already loaded; the cleaned item keys are built once per fetch
+                        type_mapping = dict(zip(inventory["_item_key"], inventory["Type"].astype(str).str.lower()))
                         
                         month_sales_chart = month_sales.copy()
                         if not month_sales_chart.empty:
-                            month_sales_chart["Clean Sold"] = month_sales_chart["Item Sold"].astype(str).str.strip().str.lower()
+                            month_sales_chart["Clean Sold"] = month_sales_chart["Item Sold"].str.strip().str.lower()
                             
                             # Map using the cleaned names
                             month_sales_chart["Raw Category"] = month_sales_chart["Clean Sold"].map(type_mapping).fillna("")
@@ -591,26 +717,21 @@ def main():
 
                 st.divider()
 
-                # Aggregate totals for the separate numerical blocks
-                total_rev = sales_df['Selling Price'].sum() + completed_nibs['Price'].sum()
-                month_rev = month_sales['Selling Price'].sum() + month_nibs['Price'].sum()
-                week_rev = week_sales['Selling Price'].sum() + week_nibs['Price'].sum()
-
                 # --- SECTION 4: REVENUE NUMERICALS ---
                 st.write("#### 📈 Revenue Details")
                 r1, r2, r3 = st.columns(3)
-                r1.metric("All-Time Revenue", f"{total_rev:,.2f}")
-                r2.metric("This Month Revenue", f"{month_rev:,.2f}")
-                r3.metric("Last 7 Days Revenue", f"{week_rev:,.2f}")
+                r1.metric("All-Time Revenue", f"{totals['all']['rev']:,.2f}")
+                r2.metric("This Month Revenue", f"{totals['month']['rev']:,.2f}")
+                r3.metric("Last 7 Days Revenue", f"{totals['week']['rev']:,.2f}")
 
                 st.write("") # Adds a tiny spacer
 
                 # --- SECTION 5: EXPENSE NUMERICALS ---
                 st.write("#### 📉 Expense Details")
                 e1, e2, e3 = st.columns(3)
-                e1.metric("All-Time Expenses", f"{expense_df['Amount'].sum():,.2f}")
-                e2.metric("This Month Expenses", f"{month_exp['Amount'].sum():,.2f}")
-                e3.metric("Last 7 Days Expenses", f"{week_exp['Amount'].sum():,.2f}")
+                e1.metric("All-Time Expenses", f"{totals['all']['exp']:,.2f}")
+                e2.metric("This Month Expenses", f"{totals['month']['exp']:,.2f}")
+                e3.metric("Last 7 Days Expenses", f"{totals['week']['exp']:,.2f}")
 
             except Exception as e:
                 st.error(f"Financials waiting for data... ({e})")